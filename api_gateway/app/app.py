@@ -1,12 +1,26 @@
 from flask import Flask, request, jsonify, Response
 import requests
-import os
+from urllib3.exceptions import HTTPError
 from flask_cors import CORS
 import logging
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
+from config import (
+    USER_SERVICE_URL, OBJECT_SERVICE_URL, DEMAND_SERVICE_URL, GATEWAY_PORT, GATEWAY_MODE,
+    CORS_ORIGINS, POOL_SIZE, POOL_BLOCK, POOL_TIMEOUT, CONNECT_TIMEOUT, READ_TIMEOUT,
+    CACHE_TTLS, CACHE_MAX_BYTES, CACHE_MAX_ENTRY_BYTES,
+    COALESCE_ROUTES, COALESCE_MAX_WAIT, COALESCE_MAX_BYTES, HEALTH_INTERVAL, HEALTH_TIMEOUT,
+    BREAKER_FAILURES, BREAKER_RESET, RETRY_MAX, RETRY_BUDGET_RATIO, RETRY_MIN_PER_SECOND,
+    HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES
+)
+from upstream import UpstreamSessions
+from proxy_headers import end_to_end_headers
+from streaming import SizedStream, iter_request_body, iter_upstream_body
+from cache import (
+    ResponseCache, CachedResponse, WRITE_METHODS, CONDITIONAL_HEADERS,
+    parse_route_ttls, make_key, etag_matches, invalidated_routes
+)
+from health import HealthProber
+from resilience import Resilience, CircuitOpenError
+from singleflight import SingleFlight, UpstreamReply, IDEMPOTENT_METHODS, route_matches, coalesce_key
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -16,7 +30,7 @@ app = Flask(__name__)
 # Configure CORS
 CORS(app, resources={
     r"/*": {  # Allow all routes
-        "origins": ["http://localhost:3000", "http://localhost:5173", "http://127.0.0.1:5173", "http://127.0.0.1:3000"],
+        "origins": CORS_ORIGINS,
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
         "allow_headers": ["Content-Type", "Authorization", "Accept"],
         "expose_headers": ["Content-Type", "Authorization"],
@@ -25,48 +39,183 @@ CORS(app, resources={
     }
 })
 
-# Service URLs from environment variables
-USER_SERVICE_URL = os.environ.get('USER_SERVICE_URL', 'http://user_service:5000')
-OBJECT_SERVICE_URL = os.environ.get('OBJECT_SERVICE_URL', 'http://object_service:5000')
-DEMAND_SERVICE_URL = os.environ.get('DEMAND_SERVICE_URL', 'http://demand_service:5000')
+# Pooled keep-alive connections to the downstream services
+upstreams = UpstreamSessions(
+    pool_size=POOL_SIZE,
+    pool_block=POOL_BLOCK,
+    pool_timeout=POOL_TIMEOUT,
+    connect_timeout=CONNECT_TIMEOUT,
+    read_timeout=READ_TIMEOUT
+)
+
+# Cache for the read-mostly GET routes
+response_cache = ResponseCache(
+    parse_route_ttls(CACHE_TTLS),
+    max_bytes=CACHE_MAX_BYTES,
+    max_entry_bytes=CACHE_MAX_ENTRY_BYTES
+)
+
+# Collapses identical concurrent GETs into a single upstream call
+single_flight = SingleFlight(max_wait=COALESCE_MAX_WAIT)
+
+# Circuit breakers, retry budgets and hedged GETs per upstream
+resilience = Resilience(
+    failure_threshold=BREAKER_FAILURES,
+    reset_timeout=BREAKER_RESET,
+    retry_ratio=RETRY_BUDGET_RATIO,
+    retry_min_per_second=RETRY_MIN_PER_SECOND,
+    max_retries=RETRY_MAX,
+    hedge_percentile=HEDGE_PERCENTILE,
+    hedge_min_samples=HEDGE_MIN_SAMPLES,
+    hedge_workers=POOL_SIZE
+)
+
+# Probes run on their own small pool so they never queue behind proxied traffic
+health_prober = HealthProber(
+    {
+        "user_service": USER_SERVICE_URL,
+        "object_service": OBJECT_SERVICE_URL,
+        "demand_service": DEMAND_SERVICE_URL
+    },
+    UpstreamSessions(pool_size=2, connect_timeout=HEALTH_TIMEOUT, read_timeout=HEALTH_TIMEOUT),
+    interval=HEALTH_INTERVAL,
+    timeout=HEALTH_TIMEOUT
+)
+
+def request_body():
+    """Stream the client's body through instead of reading it into memory"""
+    if request.content_length:
+        return SizedStream(request.stream, request.content_length)
+    if 'chunked' in request.headers.get('Transfer-Encoding', '').lower():
+        return iter_request_body(request.stream)
+    return None
+
+def cached_response(entry, hit):
+    """Serve a cache entry, or 304 if the client already holds this version"""
+    headers = list(entry.headers) + [
+        ('ETag', entry.etag),
+        ('Age', str(entry.age())),
+        ('X-Cache', 'HIT' if hit else 'MISS')
+    ]
+    if etag_matches(request.headers.get('If-None-Match'), entry.etag):
+        response_cache.record_not_modified(entry.route)
+        return Response(status=304, headers=headers)
+    return Response(entry.body, status=entry.status, headers=headers)
+
+def buffered_response(reply):
+    """Serve a fully read upstream reply, or 304 if the client already holds this version"""
+    etag = reply.header('etag')
+    if reply.status == 200 and etag_matches(request.headers.get('If-None-Match'), etag):
+        return Response(status=304, headers=[(key, value) for key, value in reply.headers
+                                             if key.lower() != 'content-length'])
+    return Response(reply.body, status=reply.status, headers=reply.headers)
 
-# For development when running outside Docker
-if os.environ.get('GATEWAY_ENV') == 'development':
-    USER_SERVICE_URL = 'http://localhost:5001'
-    OBJECT_SERVICE_URL = 'http://localhost:5002'
-    DEMAND_SERVICE_URL = 'http://localhost:5003'
+def fetch_upstream(service_url, method, url, headers, params, data=None, share_limit=None):
+    """
+    Send the request upstream.
+
+    Replies with a Content-Length up to `share_limit` are read into an
+    UpstreamReply that can be cached or shared; anything else is returned
+    as the live streaming response.
+    """
+    response = upstreams.request(
+        service_url,
+        method=method,
+        url=url,
+        headers=headers,
+        params=params,
+        data=data,
+        stream=True
+    )
+    content_length = response.headers.get('Content-Length', '')
+    if share_limit is None or not content_length.isdigit() or int(content_length) > share_limit:
+        return response
+    try:
+        body = response.raw.read(decode_content=False)
+    finally:
+        response.close()
+    return UpstreamReply(response.status_code, end_to_end_headers(response.raw.headers.items()), body)
 
 def forward_request(service_url, path='', **kwargs):
     """
-    Forward the request to a microservice and return the response
+    Forward the request to a microservice and stream the response back
     """
     url = f"{service_url}/{path}"
+    method = request.method
+
+    # Serve cacheable GETs from the gateway cache when possible
+    cache_key = None
+    if method == 'GET' and response_cache.ttl_for(path) is not None:
+        cache_key = make_key(path, request.args.items(multi=True))
+        entry = response_cache.get(path, cache_key)
+        if entry is not None:
+            return cached_response(entry, hit=True)
+
+    coalesce = method in IDEMPOTENT_METHODS and route_matches(path, COALESCE_ROUTES)
+
     try:
-        # Forward the request method, headers, and body
-        method = request.method
-        headers = {key: value for key, value in request.headers
-                  if key.lower() not in ['host', 'content-length']}
-        
-        data = request.get_data() if request.data else None
+        # Hop-by-hop headers (Connection, Keep-Alive, ...) belong to the client connection only
+        headers = dict(end_to_end_headers(request.headers, exclude=['host', 'content-length']))
         params = request.args
 
-        # Make the request to the service
-        response = requests.request(
-            method=method,
-            url=url,
-            headers=headers,
-            params=params,
-            data=data,
-            timeout=5
-        )
+        share_limit = None
+        if coalesce or cache_key is not None:
+            # Fetch the full representation so it can be stored and shared between clients
+            headers = {key: value for key, value in headers.items() if key.lower() not in CONDITIONAL_HEADERS}
+            share_limit = COALESCE_MAX_BYTES if coalesce else CACHE_MAX_ENTRY_BYTES
+        if cache_key is not None:
+            # Read before going upstream, so a write that lands meanwhile voids the store
+            generation = response_cache.generation(path)
+            headers = {key: value for key, value in headers.items() if key.lower() != 'accept-encoding'}
+            headers['Accept-Encoding'] = 'identity'
 
-        # Return the response from the service
+        # Read the body source here; attempts may run on a hedging thread outside the request context
+        data = request_body()
+
+        def attempt():
+            return fetch_upstream(service_url, method, url, headers, params, data=data, share_limit=share_limit)
+
+        def fetch():
+            # A streamed body cannot be sent twice, so only bodiless requests are retried
+            reply = resilience.call(service_url, method, attempt, replayable=data is None)
+            if cache_key is not None and isinstance(reply, UpstreamReply) and \
+                    response_cache.cacheable(reply.status, reply.headers, len(reply.body)):
+                return response_cache.put(path, cache_key, reply.status, reply.headers, reply.body,
+                                         generation=generation)
+            return reply
+
+        try:
+            if coalesce:
+                key = coalesce_key(method, path, params.items(multi=True), headers.items())
+                reply, shared = single_flight.do(key, fetch)
+                if shared and isinstance(reply, requests.Response):
+                    # The leader's reply was streamed, so there is nothing to share
+                    reply = fetch()
+            else:
+                reply = fetch()
+        finally:
+            # A write may have gone through even if we never saw the reply
+            if method in WRITE_METHODS:
+                response_cache.invalidate(invalidated_routes(path))
+
+        if isinstance(reply, CachedResponse):
+            return cached_response(reply, hit=False)
+        if isinstance(reply, UpstreamReply):
+            return buffered_response(reply)
+
+        # Pass the body through chunk by chunk, still in the upstream's encoding
         return Response(
-            response.content,
-            status=response.status_code,
-            headers=dict(response.headers)
+            iter_upstream_body(reply),
+            status=reply.status_code,
+            headers=end_to_end_headers(reply.raw.headers.items())
         )
-    except requests.exceptions.RequestException as e:
+    except CircuitOpenError as e:
+        # Fail fast while the upstream is known to be unhealthy
+        return jsonify({
+            "error": "Service unavailable",
+            "message": str(e)
+        }), 503, {'Retry-After': str(e.retry_after)}
+    except (requests.exceptions.RequestException, HTTPError) as e:
         logger.error(f"Error forwarding request to {url}: {str(e)}")
         return jsonify({
             "error": "Service unavailable",
@@ -122,41 +271,38 @@ def proxy_demands():
 def proxy_demand_path(path):
     return forward_request(DEMAND_SERVICE_URL, f'demands/{path}')
 
+# Connection pool statistics, used to size GATEWAY_POOL_SIZE
+@app.route('/gateway/pools', methods=['GET'])
+def pool_stats():
+    return jsonify(upstreams.stats())
+
+# Response cache hit/miss counters, used to tune GATEWAY_CACHE_TTLS
+@app.route('/gateway/cache', methods=['GET'])
+def cache_stats():
+    return jsonify(response_cache.stats())
+
+# Request coalescing counters
+@app.route('/gateway/coalescing', methods=['GET'])
+def coalescing_stats():
+    return jsonify(single_flight.stats.snapshot())
+
+# Circuit breaker state, retry and hedge counts per upstream
+@app.route('/gateway/resilience', methods=['GET'])
+def resilience_stats():
+    return jsonify(resilience.stats())
+
 # Health Check Endpoint
 @app.route('/health', methods=['GET'])
 def health_check():
-    health = {
-        "status": "up",
-        "services": {}
-    }
-    
-    # Check user service
-    try:
-        user_response = requests.get(f"{USER_SERVICE_URL}/users", timeout=2)
-        health["services"]["user_service"] = "up" if user_response.status_code < 500 else "down"
-    except:
-        health["services"]["user_service"] = "down"
-    
-    # Check object service
-    try:
-        object_response = requests.get(f"{OBJECT_SERVICE_URL}/galactic_objects", timeout=2)
-        health["services"]["object_service"] = "up" if object_response.status_code < 500 else "down"
-    except:
-        health["services"]["object_service"] = "down"
-    
-    # Check demand service
-    try:
-        demand_response = requests.get(f"{DEMAND_SERVICE_URL}/demands", timeout=2)
-        health["services"]["demand_service"] = "up" if demand_response.status_code < 500 else "down"
-    except:
-        health["services"]["demand_service"] = "down"
-    
-    # Overall status is "down" if any service is down
-    if "down" in health["services"].values():
-        health["status"] = "degraded"
-    
-    return jsonify(health)
+    # Served from the background prober's last results; never calls the services inline
+    return jsonify(health_prober.snapshot())
 
 if __name__ == '__main__':
-    port = int(os.environ.get('GATEWAY_PORT', 8000))
-    app.run(host='0.0.0.0', port=port) 
\ No newline at end of file
+    if GATEWAY_MODE == 'asgi':
+        import uvicorn
+        uvicorn.run('asgi:app', host='0.0.0.0', port=GATEWAY_PORT)
+    else:
+        # Started here rather than at import, so ASGI mode (which imports nothing from
+        # this module but starts its own prober) does not probe every service twice
+        health_prober.start()
+        app.run(host='0.0.0.0', port=GATEWAY_PORT) 
\ No newline at end of file
@@ -0,0 +1,320 @@
+"""
+Asyncio (ASGI) mode of the API gateway.
+
+Serves the same routes as the Flask app in app.py, but forwards requests with
+a non-blocking HTTP client so a single process can keep thousands of slow
+upstream calls in flight. Run it with GATEWAY_MODE=asgi python app/app.py.
+"""
+import logging
+import httpx
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from config import (
+    USER_SERVICE_URL, OBJECT_SERVICE_URL, DEMAND_SERVICE_URL,
+    CORS_ORIGINS, POOL_SIZE, POOL_TIMEOUT, CONNECT_TIMEOUT, READ_TIMEOUT,
+    CACHE_TTLS, CACHE_MAX_BYTES, CACHE_MAX_ENTRY_BYTES,
+    COALESCE_ROUTES, COALESCE_MAX_WAIT, COALESCE_MAX_BYTES, HEALTH_INTERVAL, HEALTH_TIMEOUT,
+    BREAKER_FAILURES, BREAKER_RESET, RETRY_MAX, RETRY_BUDGET_RATIO, RETRY_MIN_PER_SECOND,
+    HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES
+)
+from upstream import AsyncUpstreamClients, UpstreamSessions
+from health import HealthProber
+from resilience import AsyncResilience, CircuitOpenError
+from proxy_headers import end_to_end_headers
+from cache import (
+    ResponseCache, CachedResponse, WRITE_METHODS, CONDITIONAL_HEADERS,
+    parse_route_ttls, make_key, etag_matches, invalidated_routes
+)
+from singleflight import AsyncSingleFlight, UpstreamReply, IDEMPOTENT_METHODS, route_matches, coalesce_key
+
+logging.basicConfig(level=logging.INFO)
+# httpx logs every request at INFO; the Flask mode does not log proxied calls either
+logging.getLogger('httpx').setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
+
+# Pooled keep-alive connections to the downstream services
+upstreams = AsyncUpstreamClients(
+    pool_size=POOL_SIZE,
+    pool_timeout=POOL_TIMEOUT,
+    connect_timeout=CONNECT_TIMEOUT,
+    read_timeout=READ_TIMEOUT
+)
+
+# Cache for the read-mostly GET routes
+response_cache = ResponseCache(
+    parse_route_ttls(CACHE_TTLS),
+    max_bytes=CACHE_MAX_BYTES,
+    max_entry_bytes=CACHE_MAX_ENTRY_BYTES
+)
+
+# Collapses identical concurrent GETs into a single upstream call
+single_flight = AsyncSingleFlight(max_wait=COALESCE_MAX_WAIT)
+
+# Circuit breakers, retry budgets and hedged GETs per upstream
+resilience = AsyncResilience(
+    failure_threshold=BREAKER_FAILURES,
+    reset_timeout=BREAKER_RESET,
+    retry_ratio=RETRY_BUDGET_RATIO,
+    retry_min_per_second=RETRY_MIN_PER_SECOND,
+    max_retries=RETRY_MAX,
+    hedge_percentile=HEDGE_PERCENTILE,
+    hedge_min_samples=HEDGE_MIN_SAMPLES
+)
+
+# Probes run in a background thread on their own small pool, off the event loop
+health_prober = HealthProber(
+    {
+        "user_service": USER_SERVICE_URL,
+        "object_service": OBJECT_SERVICE_URL,
+        "demand_service": DEMAND_SERVICE_URL
+    },
+    UpstreamSessions(pool_size=2, connect_timeout=HEALTH_TIMEOUT, read_timeout=HEALTH_TIMEOUT),
+    interval=HEALTH_INTERVAL,
+    timeout=HEALTH_TIMEOUT
+)
+
+
+def request_body(request):
+    """Stream the client's body through instead of reading it into memory"""
+    if request.headers.get('content-length', '0') != '0' or \
+            'chunked' in request.headers.get('transfer-encoding', '').lower():
+        return request.stream()
+    return None
+
+
+def raw_header_list(pairs):
+    return [(key.encode('latin-1'), value.encode('latin-1')) for key, value in pairs]
+
+
+def cached_response(request, entry, hit):
+    """Serve a cache entry, or 304 if the client already holds this version"""
+    headers = list(entry.headers) + [
+        ('ETag', entry.etag),
+        ('Age', str(entry.age())),
+        ('X-Cache', 'HIT' if hit else 'MISS')
+    ]
+    if etag_matches(request.headers.get('if-none-match'), entry.etag):
+        response_cache.record_not_modified(entry.route)
+        response = Response(status_code=304)
+        headers = [(key, value) for key, value in headers if key.lower() != 'content-type']
+    else:
+        response = Response(entry.body, status_code=entry.status)
+    response.raw_headers = [header for header in response.raw_headers if header[0] == b'content-length'] + \
+        raw_header_list(headers)
+    return response
+
+
+def buffered_response(request, reply):
+    """Serve a fully read upstream reply, or 304 if the client already holds this version"""
+    etag = reply.header('etag')
+    if reply.status == 200 and etag_matches(request.headers.get('if-none-match'), etag):
+        response = Response(status_code=304)
+        response.raw_headers = raw_header_list(
+            (key, value) for key, value in reply.headers if key.lower() != 'content-length'
+        )
+        return response
+    response = Response(reply.body, status_code=reply.status)
+    response.raw_headers = raw_header_list(reply.headers)
+    return response
+
+
+async def fetch_upstream(service_url, method, url, headers, params, content=None, share_limit=None):
+    """
+    Send the request upstream.
+
+    Replies with a Content-Length up to `share_limit` are read into an
+    UpstreamReply that can be cached or shared; anything else is returned
+    as the live streaming response.
+    """
+    response = await upstreams.request(
+        service_url,
+        method,
+        url,
+        headers=headers,
+        params=params,
+        content=content,
+        stream=True
+    )
+    content_length = response.headers.get('content-length', '')
+    if share_limit is None or not content_length.isdigit() or int(content_length) > share_limit:
+        return response
+    try:
+        body = b''.join([chunk async for chunk in response.aiter_raw()])
+    finally:
+        await response.aclose()
+    return UpstreamReply(response.status_code, end_to_end_headers(response.headers.multi_items()), body)
+
+
+async def forward_request(request, service_url, path=''):
+    """
+    Forward the request to a microservice and stream the response back
+    """
+    url = f"{service_url}/{path}"
+    method = request.method
+
+    # Serve cacheable GETs from the gateway cache when possible
+    cache_key = None
+    if method == 'GET' and response_cache.ttl_for(path) is not None:
+        cache_key = make_key(path, request.query_params.multi_items())
+        entry = response_cache.get(path, cache_key)
+        if entry is not None:
+            return cached_response(request, entry, hit=True)
+
+    coalesce = method in IDEMPOTENT_METHODS and route_matches(path, COALESCE_ROUTES)
+
+    try:
+        # Hop-by-hop headers (Connection, Keep-Alive, ...) belong to the client connection only
+        headers = end_to_end_headers(request.headers.items(), exclude=['host'])
+        params = request.query_params
+
+        share_limit = None
+        if coalesce or cache_key is not None:
+            # Fetch the full representation so it can be stored and shared between clients
+            headers = [(key, value) for key, value in headers if key.lower() not in CONDITIONAL_HEADERS]
+            share_limit = COALESCE_MAX_BYTES if coalesce else CACHE_MAX_ENTRY_BYTES
+        if cache_key is not None:
+            # Read before going upstream, so a write that lands meanwhile voids the store
+            generation = response_cache.generation(path)
+            headers = [(key, value) for key, value in headers if key.lower() != 'accept-encoding']
+            headers.append(('Accept-Encoding', 'identity'))
+
+        content = request_body(request)
+
+        async def attempt():
+            return await fetch_upstream(service_url, method, url, headers, params,
+                                        content=content, share_limit=share_limit)
+
+        async def fetch():
+            # A streamed body cannot be sent twice, so only bodiless requests are retried
+            reply = await resilience.call(service_url, method, attempt, replayable=content is None)
+            if cache_key is not None and isinstance(reply, UpstreamReply) and \
+                    response_cache.cacheable(reply.status, reply.headers, len(reply.body)):
+                return response_cache.put(path, cache_key, reply.status, reply.headers, reply.body,
+                                         generation=generation)
+            return reply
+
+        try:
+            if coalesce:
+                key = coalesce_key(method, path, params.multi_items(), headers)
+                reply, shared = await single_flight.do(key, fetch)
+                if shared and isinstance(reply, httpx.Response):
+                    # The leader's reply was streamed, so there is nothing to share
+                    reply = await fetch()
+            else:
+                reply = await fetch()
+        finally:
+            # A write may have gone through even if we never saw the reply
+            if method in WRITE_METHODS:
+                response_cache.invalidate(invalidated_routes(path))
+    except CircuitOpenError as e:
+        # Fail fast while the upstream is known to be unhealthy
+        return JSONResponse({
+            "error": "Service unavailable",
+            "message": str(e)
+        }, status_code=503, headers={'Retry-After': str(e.retry_after)})
+    except httpx.HTTPError as e:
+        logger.error(f"Error forwarding request to {url}: {str(e)}")
+        return JSONResponse({
+            "error": "Service unavailable",
+            "message": str(e)
+        }, status_code=503)
+
+    if isinstance(reply, CachedResponse):
+        return cached_response(request, reply, hit=False)
+    if isinstance(reply, UpstreamReply):
+        return buffered_response(request, reply)
+
+    # Pass the body through chunk by chunk, still in the upstream's encoding
+    streaming = StreamingResponse(
+        reply.aiter_raw(),
+        status_code=reply.status_code,
+        background=BackgroundTask(reply.aclose)
+    )
+    # raw_headers keeps repeated headers such as Set-Cookie intact
+    streaming.raw_headers = raw_header_list(end_to_end_headers(reply.headers.multi_items()))
+    return streaming
+
+
+def proxy(service_url, path):
+    """Build an endpoint forwarding to `path` on `service_url`; `{path}` takes the matched suffix"""
+    async def endpoint(request):
+        return await forward_request(request, service_url, path.format(**request.path_params))
+    return endpoint
+
+
+async def proxy_login(request):
+    if request.method == 'OPTIONS':
+        return Response(status_code=204)
+    return await forward_request(request, USER_SERVICE_URL, 'login')
+
+
+async def health_check(request):
+    # Served from the background prober's last results; never calls the services inline
+    return JSONResponse(health_prober.snapshot())
+
+
+async def pool_stats(request):
+    return JSONResponse(upstreams.stats())
+
+
+async def cache_stats(request):
+    return JSONResponse(response_cache.stats())
+
+
+async def coalescing_stats(request):
+    return JSONResponse(single_flight.stats.snapshot())
+
+
+async def resilience_stats(request):
+    return JSONResponse(resilience.stats())
+
+
+routes = [
+    # User Service Routes
+    Route('/users', proxy(USER_SERVICE_URL, 'users'), methods=['GET', 'POST']),
+    Route('/users/{path:path}', proxy(USER_SERVICE_URL, 'users/{path}'), methods=['GET', 'POST', 'PUT', 'DELETE']),
+    Route('/login', proxy_login, methods=['POST', 'OPTIONS']),
+
+    # Galactic Object Service Routes
+    Route('/galactic_objects', proxy(OBJECT_SERVICE_URL, 'galactic_objects'), methods=['GET', 'POST']),
+    Route('/galactic_objects/{path:path}', proxy(OBJECT_SERVICE_URL, 'galactic_objects/{path}'),
+          methods=['GET', 'POST', 'PUT', 'DELETE']),
+    Route('/galactic_objects_search', proxy(OBJECT_SERVICE_URL, 'galactic_objects_search'), methods=['GET']),
+    Route('/add_galactic_objects', proxy(OBJECT_SERVICE_URL, 'add_galactic_objects'), methods=['POST']),
+    Route('/galactic_object_types', proxy(OBJECT_SERVICE_URL, 'galactic_object_types'), methods=['GET']),
+    Route('/galactic_object_types/{path:path}', proxy(OBJECT_SERVICE_URL, 'galactic_object_types/{path}'),
+          methods=['GET']),
+
+    # Demand Service Routes
+    Route('/demands', proxy(DEMAND_SERVICE_URL, 'demands'), methods=['GET', 'POST']),
+    Route('/demands/{path:path}', proxy(DEMAND_SERVICE_URL, 'demands/{path}'), methods=['GET', 'POST', 'PUT', 'DELETE']),
+
+    Route('/gateway/pools', pool_stats, methods=['GET']),
+    Route('/gateway/cache', cache_stats, methods=['GET']),
+    Route('/gateway/coalescing', coalescing_stats, methods=['GET']),
+    Route('/gateway/resilience', resilience_stats, methods=['GET']),
+    Route('/health', health_check, methods=['GET'])
+]
+
+middleware = [
+    Middleware(
+        CORSMiddleware,
+        allow_origins=CORS_ORIGINS,
+        allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+        allow_headers=["Content-Type", "Authorization", "Accept"],
+        expose_headers=["Content-Type", "Authorization"],
+        allow_credentials=True,
+        max_age=3600
+    )
+]
+
+app = Starlette(
+    routes=routes,
+    middleware=middleware,
+    on_startup=[health_prober.start],
+    on_shutdown=[health_prober.stop, upstreams.aclose]
+)
@@ -0,0 +1,205 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+WRITE_METHODS = frozenset(['POST', 'PUT', 'PATCH', 'DELETE'])
+
+# Request headers that would make the upstream answer 304 instead of the full body
+CONDITIONAL_HEADERS = frozenset(['if-none-match', 'if-modified-since', 'if-match', 'if-unmodified-since'])
+
+
+def invalidated_routes(path):
+    """Cached routes made stale by a write to the upstream `path`"""
+    if path == 'add_galactic_objects' or path == 'galactic_objects' or path.startswith('galactic_objects/'):
+        return ['galactic_objects', 'galactic_objects_search']
+    if path == 'galactic_object_types' or path.startswith('galactic_object_types/'):
+        return ['galactic_object_types']
+    return []
+
+
+def parse_route_ttls(value):
+    """Parse "route=seconds,route=seconds" into a dict"""
+    ttls = {}
+    for item in value.split(','):
+        if '=' in item:
+            route, ttl = item.split('=', 1)
+            ttls[route.strip().strip('/')] = float(ttl)
+    return ttls
+
+
+def make_key(path, query_pairs):
+    """Cache key: the path plus the query with parameters in a stable order"""
+    query = urlencode(sorted(query_pairs))
+    return f"{path}?{query}" if query else path
+
+
+def strong_etag(body):
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison as required for If-None-Match (RFC 7232, section 3.2)"""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+class CachedResponse:
+    def __init__(self, route, status, headers, body, etag, ttl):
+        self.route = route
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.etag = etag
+        self.stored_at = time.monotonic()
+        self.expires_at = self.stored_at + ttl
+
+    @property
+    def size(self):
+        return len(self.body)
+
+    def is_fresh(self, now=None):
+        return (now or time.monotonic()) < self.expires_at
+
+    def age(self):
+        return int(time.monotonic() - self.stored_at)
+
+
+class RouteCounters:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.not_modified = 0
+        self.stores = 0
+        self.invalidations = 0
+        self.stale_discards = 0
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+
+class ResponseCache:
+    """
+    Size-bounded LRU cache of upstream GET responses.
+
+    Only routes listed in `route_ttls` are cached, each with its own TTL.
+    Entries are keyed on path and normalized query and carry a strong ETag
+    so clients can revalidate with If-None-Match.
+
+    Every route has a generation that `invalidate` bumps. Callers read it
+    with `generation` before going upstream and pass it to `put`, so a
+    reply fetched before a write is not stored after that write.
+    """
+
+    def __init__(self, route_ttls, max_bytes=64 * 1024 * 1024, max_entry_bytes=4 * 1024 * 1024):
+        self.route_ttls = route_ttls
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._evictions = 0
+        self._counters = {route: RouteCounters() for route in route_ttls}
+        self._generations = {route: 0 for route in route_ttls}
+        self._lock = threading.Lock()
+
+    def ttl_for(self, route):
+        """TTL of a cacheable route, or None if the route is not cached"""
+        return self.route_ttls.get(route)
+
+    def cacheable(self, status, headers, content_length):
+        """Whether an upstream reply may be stored; `headers` are (name, value) pairs"""
+        if status != 200 or content_length is None or content_length > self.max_entry_bytes:
+            return False
+        headers = {name.lower(): value for name, value in headers}
+        if 'set-cookie' in headers:
+            return False
+        cache_control = headers.get('cache-control', '').lower()
+        return 'no-store' not in cache_control and 'private' not in cache_control
+
+    def get(self, route, key):
+        """Return the fresh entry for `key`, counting a hit or a miss"""
+        with self._lock:
+            counters = self._counters[route]
+            entry = self._entries.get(key)
+            if entry is not None and not entry.is_fresh():
+                self._remove(key)
+                counters.expired += 1
+                entry = None
+            if entry is None:
+                counters.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            counters.hits += 1
+            return entry
+
+    def generation(self, route):
+        with self._lock:
+            return self._generations[route]
+
+    def put(self, route, key, status, headers, body, generation=None):
+        """
+        Store a response and return the entry; `headers` are (name, value) pairs.
+
+        If `generation` is given and the route was invalidated since it was
+        read, the entry is returned but not stored.
+        """
+        etag = next((value for name, value in headers if name.lower() == 'etag'), None) or strong_etag(body)
+        headers = [(name, value) for name, value in headers
+                   if name.lower() not in ('etag', 'content-length', 'date')]
+        entry = CachedResponse(route, status, headers, body, etag, self.route_ttls[route])
+        with self._lock:
+            if generation is not None and generation != self._generations[route]:
+                self._counters[route].stale_discards += 1
+                return entry
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            self._counters[route].stores += 1
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+        return entry
+
+    def record_not_modified(self, route):
+        with self._lock:
+            self._counters[route].not_modified += 1
+
+    def invalidate(self, routes):
+        """Drop every entry cached for the given routes"""
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry.route in routes]:
+                self._remove(key)
+            for route in routes:
+                if route in self._counters:
+                    self._counters[route].invalidations += 1
+                    self._generations[route] += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self._evictions,
+                "routes": {
+                    route: dict(counters.as_dict(), ttl=self.route_ttls[route])
+                    for route, counters in self._counters.items()
+                }
+            }
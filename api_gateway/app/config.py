@@ -0,0 +1,60 @@
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Service URLs from environment variables
+USER_SERVICE_URL = os.environ.get('USER_SERVICE_URL', 'http://user_service:5000')
+OBJECT_SERVICE_URL = os.environ.get('OBJECT_SERVICE_URL', 'http://object_service:5000')
+DEMAND_SERVICE_URL = os.environ.get('DEMAND_SERVICE_URL', 'http://demand_service:5000')
+
+# For development when running outside Docker
+if os.environ.get('GATEWAY_ENV') == 'development':
+    USER_SERVICE_URL = 'http://localhost:5001'
+    OBJECT_SERVICE_URL = 'http://localhost:5002'
+    DEMAND_SERVICE_URL = 'http://localhost:5003'
+
+GATEWAY_PORT = int(os.environ.get('GATEWAY_PORT', 8000))
+
+# "flask" (threaded WSGI) or "asgi" (asyncio, non-blocking upstream I/O)
+GATEWAY_MODE = os.environ.get('GATEWAY_MODE', 'flask').lower()
+
+CORS_ORIGINS = ["http://localhost:3000", "http://localhost:5173", "http://127.0.0.1:5173", "http://127.0.0.1:3000"]
+
+# Upstream connection pool settings
+POOL_SIZE = int(os.environ.get('GATEWAY_POOL_SIZE', 20))
+POOL_BLOCK = os.environ.get('GATEWAY_POOL_BLOCK', 'true').lower() == 'true'
+POOL_TIMEOUT = float(os.environ.get('GATEWAY_POOL_TIMEOUT', 1.0))
+CONNECT_TIMEOUT = float(os.environ.get('GATEWAY_CONNECT_TIMEOUT', 2.0))
+READ_TIMEOUT = float(os.environ.get('GATEWAY_READ_TIMEOUT', 5.0))
+
+# Gateway response cache: "route=seconds" pairs for the GET routes served from cache
+CACHE_TTLS = os.environ.get(
+    'GATEWAY_CACHE_TTLS',
+    'galactic_object_types=300,galactic_objects=10,galactic_objects_search=10'
+)
+CACHE_MAX_BYTES = int(os.environ.get('GATEWAY_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+CACHE_MAX_ENTRY_BYTES = int(os.environ.get('GATEWAY_CACHE_MAX_ENTRY_BYTES', 4 * 1024 * 1024))
+
+# Request coalescing: identical concurrent GETs to these routes share one upstream call
+COALESCE_ROUTES = [route.strip().strip('/') for route in os.environ.get(
+    'GATEWAY_COALESCE_ROUTES',
+    'galactic_object_types,galactic_objects,galactic_objects_search'
+).split(',') if route.strip()]
+COALESCE_MAX_WAIT = float(os.environ.get('GATEWAY_COALESCE_MAX_WAIT', 1.0))
+COALESCE_MAX_BYTES = int(os.environ.get('GATEWAY_COALESCE_MAX_BYTES', 4 * 1024 * 1024))
+
+# Background health probing of the services' readiness endpoints
+HEALTH_INTERVAL = float(os.environ.get('GATEWAY_HEALTH_INTERVAL', 5.0))
+HEALTH_TIMEOUT = float(os.environ.get('GATEWAY_HEALTH_TIMEOUT', 1.0))
+
+# Per-service resilience: circuit breaker, retry budget and hedged GETs
+BREAKER_FAILURES = int(os.environ.get('GATEWAY_BREAKER_FAILURES', 5))
+BREAKER_RESET = float(os.environ.get('GATEWAY_BREAKER_RESET', 10.0))
+RETRY_MAX = int(os.environ.get('GATEWAY_RETRY_MAX', 2))
+RETRY_BUDGET_RATIO = float(os.environ.get('GATEWAY_RETRY_BUDGET_RATIO', 0.1))
+RETRY_MIN_PER_SECOND = float(os.environ.get('GATEWAY_RETRY_MIN_PER_SECOND', 1.0))
+# 0 disables hedging; e.g. 95 sends a second GET once the first is slower than the recent p95
+HEDGE_PERCENTILE = float(os.environ.get('GATEWAY_HEDGE_PERCENTILE', 0))
+HEDGE_MIN_SAMPLES = int(os.environ.get('GATEWAY_HEDGE_MIN_SAMPLES', 50))
@@ -0,0 +1,91 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class HealthProber:
+    """
+    Probe every service's readiness endpoint in the background.
+
+    All services are probed in parallel every `interval` seconds and the
+    latest results are kept, so /health answers from memory instead of
+    calling the services on each request.
+    """
+
+    def __init__(self, services, upstreams, interval=5.0, timeout=1.0, path='health/ready'):
+        self.services = services
+        self.upstreams = upstreams
+        self.interval = interval
+        self.timeout = timeout
+        self.path = path
+        self._results = {}
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = ThreadPoolExecutor(max_workers=len(services), thread_name_prefix='health-probe')
+
+    def probe(self, name, service_url):
+        start = time.perf_counter()
+        error = None
+        try:
+            response = self.upstreams.request(service_url, 'GET', f"{service_url}/{self.path}", timeout=self.timeout)
+            status = "up" if response.status_code == 200 else "down"
+            if status == "down":
+                error = f"HTTP {response.status_code}"
+        except requests.exceptions.RequestException as e:
+            status = "down"
+            error = str(e)
+        return name, {
+            "status": status,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+            "error": error
+        }
+
+    def probe_all(self):
+        results = dict(self._executor.map(lambda item: self.probe(*item), self.services.items()))
+        with self._lock:
+            self._results = results
+            self._checked_at = time.time()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.probe_all()
+            except Exception as e:
+                logger.error(f"Health probe failed: {str(e)}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='health-prober', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self):
+        """The last probe results in the gateway's /health format"""
+        with self._lock:
+            results = dict(self._results)
+            checked_at = self._checked_at
+
+        health = {
+            "status": "up",
+            "services": {name: results.get(name, {}).get("status", "unknown") for name in self.services},
+            "probes": results,
+            "checked_at": datetime.fromtimestamp(checked_at, timezone.utc).isoformat() if checked_at else None,
+            "age_seconds": round(time.time() - checked_at, 3) if checked_at else None
+        }
+
+        # Overall status is "degraded" if any service is not up, or the results are stale
+        if any(status != "up" for status in health["services"].values()) or \
+                checked_at is None or time.time() - checked_at > 3 * self.interval:
+            health["status"] = "degraded"
+
+        return health
@@ -0,0 +1,29 @@
+# Headers that describe a single connection and must not be forwarded (RFC 7230, section 6.1)
+HOP_BY_HOP_HEADERS = frozenset([
+    'connection',
+    'keep-alive',
+    'proxy-authenticate',
+    'proxy-authorization',
+    'te',
+    'trailer',
+    'trailers',
+    'transfer-encoding',
+    'upgrade'
+])
+
+
+def end_to_end_headers(pairs, exclude=()):
+    """
+    Return the (name, value) pairs that may be forwarded to the next hop.
+
+    Drops the standard hop-by-hop headers, any header named in a Connection
+    header, and the extra names in `exclude`. Repeated headers such as
+    Set-Cookie are kept as separate pairs.
+    """
+    pairs = list(pairs)
+    excluded = set(HOP_BY_HOP_HEADERS)
+    excluded.update(name.lower() for name in exclude)
+    for name, value in pairs:
+        if name.lower() == 'connection':
+            excluded.update(token.strip().lower() for token in value.split(',') if token.strip())
+    return [(name, value) for name, value in pairs if name.lower() not in excluded]
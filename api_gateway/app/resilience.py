@@ -0,0 +1,430 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import httpx
+import requests
+from urllib3.exceptions import HTTPError
+
+# Errors of one upstream attempt; reading a streamed body raises urllib3's own errors
+UPSTREAM_ERRORS = (requests.exceptions.RequestException, HTTPError)
+
+# Methods that can safely be sent twice
+RETRYABLE_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+# Upstream answers that mean "unhealthy, try again" rather than "your request is wrong"
+FAILURE_STATUSES = frozenset([502, 503, 504])
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """The breaker for a service is open, so the call was not attempted"""
+
+    def __init__(self, service, retry_after):
+        super().__init__(f"Circuit breaker open for {service}")
+        self.retry_after = retry_after
+
+
+def reply_status(reply):
+    status = getattr(reply, 'status_code', None)
+    return status if status is not None else reply.status
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After `failure_threshold` failures in a row the breaker opens and calls
+    fail immediately for `reset_timeout` seconds. It then lets
+    `half_open_max` trial calls through; a success closes it again and a
+    failure re-opens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=10.0, half_open_max=1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max = half_open_max
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trials = 0
+        self.opens = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self.state = self.HALF_OPEN
+                self.trials = 0
+            if self.state == self.HALF_OPEN:
+                if self.trials >= self.half_open_max:
+                    self.rejected += 1
+                    return False
+                self.trials += 1
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.opens += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def retry_after(self):
+        with self._lock:
+            return max(int(self.reset_timeout - (time.monotonic() - self.opened_at)) + 1, 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "opens": self.opens,
+                "rejected": self.rejected
+            }
+
+
+class RetryBudget:
+    """
+    Caps retries at a fraction of regular traffic.
+
+    Every request deposits `ratio` tokens and every retry spends one, with a
+    floor of `min_per_second` retries so a quiet service can still retry.
+    The balance never exceeds `max_tokens`, so an outage cannot be met with
+    a stored-up retry storm.
+    """
+
+    def __init__(self, ratio=0.1, min_per_second=1.0, max_tokens=10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.updated_at = time.monotonic()
+        self.retries = 0
+        self.exhausted = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, deposit=0.0):
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + deposit + (now - self.updated_at) * self.min_per_second)
+        self.updated_at = now
+
+    def record_request(self):
+        with self._lock:
+            self._refill(self.ratio)
+
+    def try_spend(self):
+        with self._lock:
+            self._refill()
+            if self.tokens < 1:
+                self.exhausted += 1
+                return False
+            self.tokens -= 1
+            self.retries += 1
+            return True
+
+    def snapshot(self):
+        with self._lock:
+            return {"retries": self.retries, "exhausted": self.exhausted, "tokens": round(self.tokens, 2)}
+
+
+class LatencyTracker:
+    """Recent upstream latencies, used to pick the hedging delay"""
+
+    def __init__(self, size=512):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct, min_samples=1):
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(int(len(ordered) * pct / 100.0), len(ordered) - 1)]
+
+
+class ServiceGuard:
+    """Breaker, retry budget and latency history of one upstream service"""
+
+    def __init__(self, name, failure_threshold, reset_timeout, retry_ratio, retry_min_per_second,
+                 max_retries, hedge_percentile, hedge_min_samples):
+        self.name = name
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.budget = RetryBudget(retry_ratio, retry_min_per_second)
+        self.latencies = LatencyTracker()
+        self.max_retries = max_retries
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+
+    def count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def hedge_delay(self, method, replayable=True):
+        """Seconds to wait before hedging this request, or None if it should not be hedged"""
+        if method != 'GET' or not replayable or not self.hedge_percentile or \
+                self.breaker.state != CircuitBreaker.CLOSED:
+            return None
+        return self.latencies.percentile(self.hedge_percentile, self.hedge_min_samples)
+
+    def check(self):
+        if not self.breaker.allow():
+            raise CircuitOpenError(self.name, self.breaker.retry_after())
+
+    def record(self, started, reply=None):
+        """Feed the outcome of one attempt to the breaker and the latency history; no reply is a failure"""
+        if reply is None or reply_status(reply) in FAILURE_STATUSES:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+            self.latencies.record(time.perf_counter() - started)
+
+    def snapshot(self):
+        return {
+            "breaker": self.breaker.snapshot(),
+            "retry_budget": self.budget.snapshot(),
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "latency_p50_ms": _ms(self.latencies.percentile(50)),
+            "latency_p99_ms": _ms(self.latencies.percentile(99)),
+            "hedge_delay_ms": _ms(self.hedge_delay('GET'))
+        }
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def _close(reply):
+    if isinstance(reply, requests.Response):
+        reply.close()
+
+
+class Resilience:
+    """
+    Per-service circuit breaking, budgeted retries and hedged GETs.
+
+    `call` runs an attempt function (which sends one upstream request and
+    returns the reply) under the guard of the target service.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=10.0, retry_ratio=0.1, retry_min_per_second=1.0,
+                 max_retries=2, hedge_percentile=0, hedge_min_samples=50, hedge_workers=32):
+        self.settings = dict(
+            failure_threshold=failure_threshold,
+            reset_timeout=reset_timeout,
+            retry_ratio=retry_ratio,
+            retry_min_per_second=retry_min_per_second,
+            max_retries=max_retries,
+            hedge_percentile=hedge_percentile,
+            hedge_min_samples=hedge_min_samples
+        )
+        self.hedge_workers = hedge_workers
+        self._executor = None
+        # Hedges are only sent when a worker is free, so they never queue
+        self._hedge_slots = threading.BoundedSemaphore(hedge_workers)
+        self._guards = {}
+        self._lock = threading.Lock()
+
+    def guard(self, service):
+        guard = self._guards.get(service)
+        if guard is None:
+            with self._lock:
+                guard = self._guards.setdefault(service, ServiceGuard(service, **self.settings))
+        return guard
+
+    def _attempt(self, guard, attempt):
+        started = time.perf_counter()
+        reply = None
+        try:
+            reply = attempt()
+            return reply
+        finally:
+            # Anything that ends without a reply counts as a failure, which also
+            # hands back a half-open trial whatever was raised
+            guard.record(started, reply)
+
+    def _run_primary(self, guard, attempt, primary):
+        try:
+            primary.set_result(self._attempt(guard, attempt))
+        except BaseException as e:
+            primary.set_exception(e)
+
+    def _run_hedge(self, guard, attempt):
+        try:
+            return self._attempt(guard, attempt)
+        finally:
+            self._hedge_slots.release()
+
+    def _hedged_attempt(self, guard, attempt, delay):
+        """
+        Send `attempt`; if it is slower than `delay`, race a second copy against it.
+
+        The primary starts at once on a thread of its own, so `delay` measures
+        the upstream rather than a queue; the request thread has to stay free
+        to return whichever copy answers first. Only the hedge goes to the
+        shared pool, and it is skipped while every hedge worker is busy.
+        """
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.hedge_workers, thread_name_prefix='hedge')
+
+        primary = Future()
+        threading.Thread(target=self._run_primary, args=(guard, attempt, primary),
+                         name='hedge-primary', daemon=True).start()
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._hedge_slots.acquire(blocking=False):
+            return primary.result()
+
+        guard.count('hedges')
+        hedge = self._executor.submit(self._run_hedge, guard, attempt)
+        pending = {primary, hedge}
+        first_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    first_error = first_error or future.exception()
+                    continue
+                # Whoever finishes second is not needed; release its connection
+                for loser in pending:
+                    loser.add_done_callback(lambda f: f.exception() is None and _close(f.result()))
+                if future is hedge:
+                    guard.count('hedge_wins')
+                return future.result()
+        raise first_error
+
+    def call(self, service, method, attempt, replayable=True):
+        """
+        Run `attempt` for `service`.
+
+        Failed idempotent requests are retried while the retry budget allows
+        it; requests whose body cannot be replayed are never retried.
+        """
+        guard = self.guard(service)
+        guard.budget.record_request()
+        retries = 0
+        while True:
+            guard.check()
+            delay = guard.hedge_delay(method, replayable)
+            try:
+                if delay is not None:
+                    reply = self._hedged_attempt(guard, attempt, delay)
+                else:
+                    reply = self._attempt(guard, attempt)
+                error = None
+            except UPSTREAM_ERRORS as e:
+                reply, error = None, e
+
+            if error is None and reply_status(reply) not in FAILURE_STATUSES:
+                return reply
+            if replayable and method in RETRYABLE_METHODS and retries < guard.max_retries \
+                    and guard.budget.try_spend():
+                retries += 1
+                if reply is not None:
+                    _close(reply)
+                continue
+            if error is not None:
+                raise error
+            return reply
+
+    def stats(self):
+        with self._lock:
+            guards = dict(self._guards)
+        return {service: guard.snapshot() for service, guard in guards.items()}
+
+
+class AsyncResilience(Resilience):
+    """Resilience for coroutine attempts on one event loop"""
+
+    async def _attempt(self, guard, attempt):
+        started = time.perf_counter()
+        reply = None
+        try:
+            reply = await attempt()
+            return reply
+        finally:
+            # Includes cancellation, so a cancelled half-open trial is handed back too
+            guard.record(started, reply)
+
+    async def _hedged_attempt(self, guard, attempt, delay):
+        primary = asyncio.ensure_future(self._attempt(guard, attempt))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        guard.count('hedges')
+        hedge = asyncio.ensure_future(self._attempt(guard, attempt))
+        pending = {primary, hedge}
+        first_error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    first_error = first_error or task.exception()
+                    continue
+                # The slower copy is not needed; cancelling it releases its connection
+                for loser in pending:
+                    loser.cancel()
+                    loser.add_done_callback(_aclose_result)
+                if task is hedge:
+                    guard.count('hedge_wins')
+                return task.result()
+        raise first_error
+
+    async def call(self, service, method, attempt, replayable=True):
+        guard = self.guard(service)
+        guard.budget.record_request()
+        retries = 0
+        while True:
+            guard.check()
+            delay = guard.hedge_delay(method, replayable)
+            try:
+                if delay is not None:
+                    reply = await self._hedged_attempt(guard, attempt, delay)
+                else:
+                    reply = await self._attempt(guard, attempt)
+                error = None
+            except httpx.HTTPError as e:
+                reply, error = None, e
+
+            if error is None and reply_status(reply) not in FAILURE_STATUSES:
+                return reply
+            if replayable and method in RETRYABLE_METHODS and retries < guard.max_retries \
+                    and guard.budget.try_spend():
+                retries += 1
+                if isinstance(reply, httpx.Response):
+                    await reply.aclose()
+                continue
+            if error is not None:
+                raise error
+            return reply
+
+
+def _aclose_result(task):
+    if not task.cancelled() and task.exception() is None and isinstance(task.result(), httpx.Response):
+        asyncio.ensure_future(task.result().aclose())
@@ -0,0 +1,152 @@
+import asyncio
+import threading
+from urllib.parse import urlencode
+
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD'])
+
+# Request headers that can change what the upstream answers, so they are part of the key
+VARY_HEADERS = ('authorization', 'cookie', 'accept', 'accept-encoding', 'accept-language')
+
+
+def route_matches(path, routes):
+    """Whether `path` is one of `routes` or lies below one of them"""
+    return any(path == route or path.startswith(route + '/') for route in routes)
+
+
+def coalesce_key(method, path, query_pairs, headers):
+    """Identity of a request for coalescing; `headers` are the (name, value) pairs sent upstream"""
+    header_values = {name.lower(): value for name, value in headers if name.lower() in VARY_HEADERS}
+    vary = tuple(header_values.get(name, '') for name in VARY_HEADERS)
+    return (method, path, urlencode(sorted(query_pairs)), vary)
+
+
+class UpstreamReply:
+    """A fully read upstream response that can be handed to several waiting clients"""
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def header(self, name):
+        return next((value for key, value in self.headers if key.lower() == name), None)
+
+
+class FlightStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def record(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            calls = self.leaders + self.followers
+            return {
+                "leaders": self.leaders,
+                "followers": self.followers,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "coalesced_ratio": round(self.followers / calls, 4) if calls else 0.0
+            }
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapse concurrent identical calls into one.
+
+    The first caller for a key (the leader) runs the call; callers arriving
+    while it is in flight wait for its result. A follower that waits longer
+    than `max_wait` stops waiting and makes the call itself, so a slow leader
+    cannot stall everyone behind it.
+    """
+
+    def __init__(self, max_wait=1.0):
+        self.max_wait = max_wait
+        self.stats = FlightStats()
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Return (result, shared); `shared` is True if another caller's result was reused"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if leader:
+            self.stats.record('leaders')
+            try:
+                call.result = fn()
+                return call.result, False
+            except Exception as e:
+                self.stats.record('errors')
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        self.stats.record('followers')
+        if not call.done.wait(self.max_wait):
+            self.stats.record('timeouts')
+            return fn(), False
+        if call.error is not None:
+            raise call.error
+        return call.result, True
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines running on one event loop"""
+
+    def __init__(self, max_wait=1.0):
+        self.max_wait = max_wait
+        self.stats = FlightStats()
+        self._calls = {}
+
+    async def do(self, key, fn):
+        """Return (result, shared); `fn` is a coroutine function"""
+        future = self._calls.get(key)
+        if future is None:
+            future = self._calls[key] = asyncio.get_running_loop().create_future()
+            self.stats.record('leaders')
+            try:
+                result = await fn()
+                future.set_result(result)
+                return result, False
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                self.stats.record('errors')
+                future.set_exception(e)
+                # Mark the exception retrieved in case nobody was waiting
+                future.exception()
+                raise
+            finally:
+                del self._calls[key]
+
+        self.stats.record('followers')
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.max_wait), True
+        except asyncio.TimeoutError:
+            self.stats.record('timeouts')
+        except asyncio.CancelledError:
+            # Only fall back if the leader was cancelled, not this follower
+            if not future.cancelled():
+                raise
+        return await fn(), False
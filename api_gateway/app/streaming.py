@@ -0,0 +1,51 @@
+import logging
+from urllib3.exceptions import HTTPError
+
+logger = logging.getLogger(__name__)
+
+# Size of the pieces passed between client and upstream
+CHUNK_SIZE = 64 * 1024
+
+
+class SizedStream:
+    """
+    File-like view of a request body whose length is known up front.
+
+    requests sends it with a Content-Length header and reads it in blocks,
+    so the body is never held in memory as a whole.
+    """
+
+    def __init__(self, stream, length):
+        self.stream = stream
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        return self.stream.read(size)
+
+
+def iter_request_body(stream, chunk_size=CHUNK_SIZE):
+    """Yield a request body of unknown length; requests sends it chunked"""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def iter_upstream_body(response, chunk_size=CHUNK_SIZE):
+    """
+    Yield the upstream body exactly as received (still content-encoded).
+
+    The connection goes back to the pool once the body is fully read; if the
+    client disconnects early it is closed instead.
+    """
+    try:
+        for chunk in response.raw.stream(chunk_size, decode_content=False):
+            yield chunk
+    except (HTTPError, OSError) as e:
+        logger.error(f"Error streaming response from {response.url}: {str(e)}")
+    finally:
+        response.close()
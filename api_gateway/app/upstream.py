@@ -0,0 +1,223 @@
+import threading
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import EmptyPoolError
+
+
+class PoolExhausted(requests.exceptions.ConnectionError):
+    """No free upstream connection became available within the pool timeout"""
+
+
+class PoolStats:
+    """Counters describing how well an upstream connection pool is reused"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.waits = 0
+        self.exhausted = 0
+
+    def record_wait(self):
+        with self._lock:
+            self.waits += 1
+
+    def record_checkout(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_new_connection(self):
+        with self._lock:
+            self.new_connections += 1
+
+    def record_exhausted(self):
+        with self._lock:
+            self.exhausted += 1
+
+    def snapshot(self):
+        with self._lock:
+            reused = max(self.requests - self.new_connections, 0)
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reused_connections": reused,
+                "reuse_ratio": round(reused / self.requests, 4) if self.requests else 0.0,
+                "waits": self.waits,
+                "exhausted": self.exhausted
+            }
+
+
+def _instrumented_pool(base, stats, pool_timeout):
+    """Build a urllib3 pool class that reports checkouts and connects to `stats`"""
+
+    class InstrumentedConnection(base.ConnectionCls):
+        # Pooled connections reconnect in place when the server closed them,
+        # so count connects rather than newly created connection objects
+        def connect(self):
+            stats.record_new_connection()
+            return super().connect()
+
+    class InstrumentedPool(base):
+        ConnectionCls = InstrumentedConnection
+
+        def _get_conn(self, timeout=None):
+            # An empty queue means every connection is checked out and we block
+            if self.pool is not None and self.pool.empty():
+                stats.record_wait()
+            conn = super()._get_conn(timeout if timeout is not None else pool_timeout)
+            stats.record_checkout()
+            return conn
+
+    return InstrumentedPool
+
+
+class InstrumentedAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools keep PoolStats up to date"""
+
+    def __init__(self, stats, pool_timeout, **kwargs):
+        # init_poolmanager() runs inside HTTPAdapter.__init__, so set these first
+        self.stats = stats
+        self.pool_timeout = pool_timeout
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _instrumented_pool(HTTPConnectionPool, self.stats, self.pool_timeout),
+            'https': _instrumented_pool(HTTPSConnectionPool, self.stats, self.pool_timeout)
+        }
+
+
+class UpstreamSessions:
+    """
+    One keep-alive requests.Session per downstream service URL.
+
+    Each session owns a bounded connection pool so proxied calls reuse TCP
+    connections instead of opening a new one per request.
+    """
+
+    def __init__(self, pool_size=20, pool_block=True, pool_timeout=1.0,
+                 connect_timeout=2.0, read_timeout=5.0):
+        self.pool_size = pool_size
+        self.pool_block = pool_block
+        self.pool_timeout = pool_timeout
+        self.timeout = (connect_timeout, read_timeout)
+        self._sessions = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def session_for(self, service_url):
+        """Return the pooled session for a service, creating it on first use"""
+        session = self._sessions.get(service_url)
+        if session is not None:
+            return session
+
+        with self._lock:
+            session = self._sessions.get(service_url)
+            if session is None:
+                stats = PoolStats()
+                adapter = InstrumentedAdapter(
+                    stats,
+                    self.pool_timeout,
+                    pool_connections=1,
+                    pool_maxsize=self.pool_size,
+                    pool_block=self.pool_block,
+                    max_retries=0
+                )
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                # Forwarded headers are authoritative; don't add the session defaults
+                session.headers.clear()
+                session.headers['Connection'] = 'keep-alive'
+                self._stats[service_url] = stats
+                self._sessions[service_url] = session
+            return session
+
+    def request(self, service_url, method, url, **kwargs):
+        """Issue a request to `url` over the pooled session for `service_url`"""
+        kwargs.setdefault('timeout', self.timeout)
+        session = self.session_for(service_url)
+        try:
+            return session.request(method=method, url=url, **kwargs)
+        except EmptyPoolError as e:
+            self._stats[service_url].record_exhausted()
+            raise PoolExhausted(f"Connection pool for {service_url} exhausted: {e}")
+
+    def stats(self):
+        """Per-service pool statistics for the /gateway/pools endpoint"""
+        with self._lock:
+            stats = dict(self._stats)
+        return {
+            service_url: dict(service_stats.snapshot(), pool_size=self.pool_size)
+            for service_url, service_stats in stats.items()
+        }
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+class AsyncUpstreamClients:
+    """
+    One keep-alive httpx.AsyncClient per downstream service URL.
+
+    Used by the asyncio gateway mode; a request waiting on a slow upstream
+    costs a suspended coroutine instead of a blocked thread.
+    """
+
+    def __init__(self, pool_size=20, pool_timeout=1.0, connect_timeout=2.0, read_timeout=5.0):
+        self.pool_size = pool_size
+        self.limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self.timeout = httpx.Timeout(connect=connect_timeout, read=read_timeout,
+                                     write=read_timeout, pool=pool_timeout)
+        self._clients = {}
+        self._stats = {}
+
+    def client_for(self, service_url):
+        """Return the pooled client for a service, creating it on first use"""
+        client = self._clients.get(service_url)
+        if client is None:
+            client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+            self._stats[service_url] = PoolStats()
+            self._clients[service_url] = client
+        return client
+
+    async def request(self, service_url, method, url, stream=False, **kwargs):
+        """
+        Issue a request to `url` over the pooled client for `service_url`.
+
+        With stream=True the body is left unread; the caller must close the
+        response (aclose) to hand the connection back.
+        """
+        client = self.client_for(service_url)
+        stats = self._stats[service_url]
+
+        async def trace(event_name, info):
+            if event_name == 'connection.connect_tcp.started':
+                stats.record_new_connection()
+
+        upstream_request = client.build_request(method, url, extensions={'trace': trace}, **kwargs)
+        try:
+            response = await client.send(upstream_request, stream=stream)
+        except httpx.PoolTimeout:
+            stats.record_exhausted()
+            raise
+        stats.record_checkout()
+        return response
+
+    def stats(self):
+        """Per-service pool statistics for the /gateway/pools endpoint"""
+        return {
+            service_url: dict(service_stats.snapshot(), pool_size=self.pool_size)
+            for service_url, service_stats in self._stats.items()
+        }
+
+    async def aclose(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
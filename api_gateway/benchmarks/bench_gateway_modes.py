@@ -0,0 +1,161 @@
+"""
+Compare the Flask and ASGI gateway modes against a slow upstream.
+
+Starts a fake user_service that answers GET /users after a fixed delay, runs
+the gateway once per mode in front of it and drives both with the same
+concurrent load. Prints throughput, p50/p99 latency and error counts.
+
+    python benchmarks/bench_gateway_modes.py --concurrency 500 --requests 5000 --delay 0.5
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import httpx
+
+GATEWAY_APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app', 'app.py')
+
+SLOW_UPSTREAM = '''
+import asyncio, json, sys, uvicorn
+
+DELAY = float(sys.argv[2])
+BODY = json.dumps([{"uuid": str(i), "username": f"user{i}"} for i in range(20)]).encode()
+
+async def app(scope, receive, send):
+    if scope["type"] != "http":
+        return
+    await asyncio.sleep(DELAY)
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"application/json"),
+                            (b"content-length", str(len(BODY)).encode())]})
+    await send({"type": "http.response.body", "body": BODY})
+
+uvicorn.run(app, host="127.0.0.1", port=int(sys.argv[1]), log_level="warning", backlog=4096)
+'''
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(int(round(pct / 100.0 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+async def wait_until_up(url, deadline=15.0):
+    start = time.monotonic()
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() - start < deadline:
+            try:
+                await client.get(url, timeout=1)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+async def fetch(conn, host, port, path):
+    """GET `path` over a raw keep-alive connection; the client must stay cheaper than the gateway"""
+    if conn is None:
+        conn = await asyncio.open_connection(host, port)
+    reader, writer = conn
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode('latin-1').split("\r\n")
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            key, value = line.split(':', 1)
+            headers[key.strip().lower()] = value.strip()
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    else:
+        await reader.read()
+    if lines[0].startswith('HTTP/1.0') or headers.get('connection', '').lower() == 'close' \
+            or 'content-length' not in headers:
+        writer.close()
+        conn = None
+    return status, conn
+
+
+async def drive(host, port, path, concurrency, total):
+    latencies = []
+    errors = 0
+    remaining = total
+
+    async def worker():
+        nonlocal remaining, errors
+        conn = None
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            try:
+                status, conn = await fetch(conn, host, port, path)
+                if status != 200:
+                    errors += 1
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                errors += 1
+                conn = None
+            latencies.append(time.perf_counter() - start)
+        if conn is not None:
+            conn[1].close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "throughput": total / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "errors": errors
+    }
+
+
+def run_mode(mode, args):
+    env = dict(
+        os.environ,
+        GATEWAY_MODE=mode,
+        GATEWAY_PORT=str(args.gateway_port),
+        USER_SERVICE_URL=f"http://127.0.0.1:{args.upstream_port}",
+        GATEWAY_POOL_SIZE=str(args.concurrency),
+        GATEWAY_POOL_TIMEOUT='30',
+        GATEWAY_READ_TIMEOUT='30'
+    )
+    gateway = subprocess.Popen([sys.executable, GATEWAY_APP], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        asyncio.run(wait_until_up(f"http://127.0.0.1:{args.gateway_port}/gateway/pools"))
+        return asyncio.run(drive('127.0.0.1', args.gateway_port, '/users', args.concurrency, args.requests))
+    finally:
+        gateway.terminate()
+        gateway.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--delay', type=float, default=0.2, help="upstream response delay in seconds")
+    parser.add_argument('--gateway-port', type=int, default=8100)
+    parser.add_argument('--upstream-port', type=int, default=8101)
+    parser.add_argument('--modes', default='flask,asgi')
+    args = parser.parse_args()
+
+    upstream = subprocess.Popen([sys.executable, '-c', SLOW_UPSTREAM, str(args.upstream_port), str(args.delay)])
+    try:
+        asyncio.run(wait_until_up(f"http://127.0.0.1:{args.upstream_port}/"))
+        print(f"{args.requests} requests, concurrency {args.concurrency}, upstream delay {args.delay * 1000:.0f} ms")
+        print(f"{'mode':<8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for mode in args.modes.split(','):
+            result = run_mode(mode, args)
+            print(f"{mode:<8}{result['throughput']:>10.1f}{result['p50_ms']:>10.1f}"
+                  f"{result['p99_ms']:>10.1f}{result['errors']:>8}")
+    finally:
+        upstream.terminate()
+        upstream.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The gateway modules import each other by bare name, as when run as app/app.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
@@ -0,0 +1,91 @@
+import threading
+from cache import ResponseCache, etag_matches, invalidated_routes, make_key
+
+ROUTES = {'galactic_objects': 10, 'galactic_objects_search': 10, 'galactic_object_types': 300}
+
+
+def test_put_then_get():
+    cache = ResponseCache(ROUTES)
+    cache.put('galactic_objects', 'galactic_objects', 200, [('Content-Type', 'application/json')], b'[]')
+    entry = cache.get('galactic_objects', 'galactic_objects')
+    assert entry.body == b'[]'
+    assert entry.etag.startswith('"')
+
+
+def test_key_ignores_parameter_order():
+    assert make_key('galactic_objects_search', [('b', '2'), ('a', '1')]) == \
+        make_key('galactic_objects_search', [('a', '1'), ('b', '2')])
+
+
+def test_invalidate_drops_entries():
+    cache = ResponseCache(ROUTES)
+    cache.put('galactic_objects_search', 'galactic_objects_search?name=a', 200, [], b'old')
+    cache.invalidate(invalidated_routes('add_galactic_objects'))
+    assert cache.get('galactic_objects_search', 'galactic_objects_search?name=a') is None
+
+
+def test_reply_fetched_before_a_write_is_not_stored():
+    cache = ResponseCache(ROUTES)
+    generation = cache.generation('galactic_objects_search')
+
+    # The write lands while the GET is still waiting for the upstream
+    cache.invalidate(invalidated_routes('add_galactic_objects'))
+    entry = cache.put('galactic_objects_search', 'galactic_objects_search', 200, [], b'pre-write',
+                      generation=generation)
+
+    assert entry.body == b'pre-write'
+    assert cache.get('galactic_objects_search', 'galactic_objects_search') is None
+    assert cache.stats()['routes']['galactic_objects_search']['stale_discards'] == 1
+
+
+def test_writes_to_other_routes_do_not_void_stores():
+    cache = ResponseCache(ROUTES)
+    generation = cache.generation('galactic_object_types')
+    cache.invalidate(invalidated_routes('galactic_objects/123'))
+    cache.put('galactic_object_types', 'galactic_object_types', 200, [], b'types', generation=generation)
+    assert cache.get('galactic_object_types', 'galactic_object_types') is not None
+
+
+def test_concurrent_write_during_slow_fetch():
+    cache = ResponseCache(ROUTES)
+    fetching = threading.Event()
+    written = threading.Event()
+
+    def slow_get():
+        generation = cache.generation('galactic_objects')
+        fetching.set()
+        written.wait(1)
+        cache.put('galactic_objects', 'galactic_objects', 200, [], b'pre-write', generation=generation)
+
+    reader = threading.Thread(target=slow_get)
+    reader.start()
+    fetching.wait(1)
+    cache.invalidate(invalidated_routes('galactic_objects'))
+    written.set()
+    reader.join()
+
+    assert cache.get('galactic_objects', 'galactic_objects') is None
+
+
+def test_lru_eviction_by_bytes():
+    cache = ResponseCache(ROUTES, max_bytes=10)
+    cache.put('galactic_objects', 'a', 200, [], b'123456')
+    cache.put('galactic_objects', 'b', 200, [], b'123456')
+    assert cache.get('galactic_objects', 'a') is None
+    assert cache.get('galactic_objects', 'b') is not None
+
+
+def test_uncacheable_replies():
+    cache = ResponseCache(ROUTES, max_entry_bytes=4)
+    assert not cache.cacheable(500, [], 2)
+    assert not cache.cacheable(200, [], 5)
+    assert not cache.cacheable(200, [('Set-Cookie', 'a=b')], 2)
+    assert not cache.cacheable(200, [('Cache-Control', 'no-store')], 2)
+    assert cache.cacheable(200, [], 2)
+
+
+def test_etag_matches():
+    assert etag_matches('"a", W/"b"', '"b"')
+    assert etag_matches('*', '"a"')
+    assert not etag_matches('"a"', '"b"')
+    assert not etag_matches(None, '"a"')
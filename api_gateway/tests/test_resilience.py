@@ -0,0 +1,183 @@
+import asyncio
+import time
+import httpx
+import pytest
+import requests
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+from resilience import AsyncResilience, CircuitBreaker, CircuitOpenError, Resilience, RetryBudget
+
+
+class Reply:
+    def __init__(self, status=200):
+        self.status = status
+
+
+def failing(error):
+    def attempt():
+        raise error
+    return attempt
+
+
+UPSTREAM_ERRORS = [
+    requests.exceptions.ConnectionError('refused'),
+    requests.exceptions.ReadTimeout('slow'),
+    ReadTimeoutError(None, None, 'stalled body'),
+    ProtocolError('connection broken'),
+    RuntimeError('bug in the attempt')
+]
+
+
+def make_resilience(**kwargs):
+    settings = dict(failure_threshold=2, reset_timeout=0.05, max_retries=0)
+    settings.update(kwargs)
+    return Resilience(**settings)
+
+
+@pytest.mark.parametrize('error', UPSTREAM_ERRORS, ids=lambda e: type(e).__name__)
+def test_every_error_opens_the_breaker(error):
+    resilience = make_resilience()
+    for _ in range(2):
+        with pytest.raises(type(error)):
+            resilience.call('svc', 'GET', failing(error))
+    assert resilience.guard('svc').breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        resilience.call('svc', 'GET', lambda: Reply())
+
+
+@pytest.mark.parametrize('error', UPSTREAM_ERRORS, ids=lambda e: type(e).__name__)
+def test_failed_trial_reopens_and_a_later_trial_closes(error):
+    resilience = make_resilience()
+    for _ in range(2):
+        with pytest.raises(type(error)):
+            resilience.call('svc', 'GET', failing(error))
+
+    time.sleep(0.06)
+    with pytest.raises(type(error)):
+        resilience.call('svc', 'GET', failing(error))
+    assert resilience.guard('svc').breaker.state == CircuitBreaker.OPEN
+
+    time.sleep(0.06)
+    assert resilience.call('svc', 'GET', lambda: Reply()).status == 200
+    assert resilience.guard('svc').breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failure_statuses_count_and_are_returned():
+    resilience = make_resilience()
+    for _ in range(2):
+        assert resilience.call('svc', 'GET', lambda: Reply(503)).status == 503
+    assert resilience.guard('svc').breaker.state == CircuitBreaker.OPEN
+
+
+def test_client_errors_do_not_count():
+    resilience = make_resilience()
+    for _ in range(3):
+        resilience.call('svc', 'GET', lambda: Reply(404))
+    assert resilience.guard('svc').breaker.state == CircuitBreaker.CLOSED
+
+
+def test_success_resets_consecutive_failures():
+    resilience = make_resilience()
+    resilience.call('svc', 'GET', lambda: Reply(502))
+    resilience.call('svc', 'GET', lambda: Reply())
+    resilience.call('svc', 'GET', lambda: Reply(502))
+    assert resilience.guard('svc').breaker.state == CircuitBreaker.CLOSED
+
+
+def test_retries_idempotent_replayable_requests():
+    resilience = make_resilience(failure_threshold=10, max_retries=2)
+    replies = [Reply(503), Reply(503), Reply()]
+    assert resilience.call('svc', 'GET', lambda: replies.pop(0)).status == 200
+
+
+def test_urllib3_errors_are_retried():
+    resilience = make_resilience(failure_threshold=10, max_retries=1)
+    outcomes = [ReadTimeoutError(None, None, 'stalled'), Reply()]
+
+    def attempt():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert resilience.call('svc', 'GET', attempt).status == 200
+
+
+def test_no_retry_without_replayable_body_or_for_post():
+    resilience = make_resilience(failure_threshold=10, max_retries=2)
+    calls = []
+
+    def attempt():
+        calls.append(1)
+        return Reply(503)
+
+    resilience.call('svc', 'GET', attempt, replayable=False)
+    resilience.call('svc', 'POST', attempt)
+    assert len(calls) == 2
+
+
+def test_retry_budget_runs_out():
+    budget = RetryBudget(ratio=0, min_per_second=0, max_tokens=2)
+    assert budget.try_spend()
+    assert budget.try_spend()
+    assert not budget.try_spend()
+
+
+def test_no_hedging_for_streamed_bodies():
+    resilience = make_resilience(hedge_percentile=50, hedge_min_samples=1)
+    resilience.call('svc', 'GET', lambda: Reply())
+    guard = resilience.guard('svc')
+    assert guard.hedge_delay('GET') is not None
+    assert guard.hedge_delay('GET', replayable=False) is None
+    assert guard.hedge_delay('POST') is None
+
+
+def test_hedge_answers_for_a_slow_primary():
+    resilience = make_resilience(hedge_percentile=50, hedge_min_samples=1, hedge_workers=1)
+    for _ in range(3):
+        resilience.call('svc', 'GET', lambda: Reply())
+    calls = []
+
+    def attempt():
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(0.5)
+        return Reply()
+
+    started = time.perf_counter()
+    resilience.call('svc', 'GET', attempt)
+    assert time.perf_counter() - started < 0.4
+    assert resilience.stats()['svc']['hedge_wins'] == 1
+
+
+def test_async_errors_and_cancellation_release_the_trial():
+    async def scenario():
+        resilience = AsyncResilience(failure_threshold=1, reset_timeout=0.05, max_retries=0)
+
+        async def broken():
+            raise httpx.RemoteProtocolError('connection broken')
+
+        async def hanging():
+            await asyncio.sleep(10)
+
+        async def ok():
+            return Reply()
+
+        with pytest.raises(httpx.RemoteProtocolError):
+            await resilience.call('svc', 'GET', broken)
+        breaker = resilience.guard('svc').breaker
+        assert breaker.state == CircuitBreaker.OPEN
+
+        # The trial is cancelled, e.g. because the client went away
+        await asyncio.sleep(0.06)
+        trial = asyncio.ensure_future(resilience.call('svc', 'GET', hanging))
+        await asyncio.sleep(0.01)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        assert breaker.state == CircuitBreaker.OPEN
+
+        await asyncio.sleep(0.06)
+        reply = await resilience.call('svc', 'GET', ok)
+        return reply.status, breaker.state
+
+    assert asyncio.run(scenario()) == (200, CircuitBreaker.CLOSED)
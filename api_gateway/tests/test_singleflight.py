@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import time
+import pytest
+from singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_followers_share_the_leader_result():
+    flight = SingleFlight(max_wait=1.0)
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(1)
+        return 'reply'
+
+    threads = [threading.Thread(target=lambda: results.append(flight.do('key', fetch))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert all(result == 'reply' for result, _ in results)
+
+
+def test_slow_leader_follower_times_out_and_fetches_itself():
+    flight = SingleFlight(max_wait=0.05)
+    release = threading.Event()
+    leader = threading.Thread(target=flight.do, args=('key', lambda: release.wait(1) and 'leader'))
+    leader.start()
+    time.sleep(0.02)
+
+    result, shared = flight.do('key', lambda: 'own')
+    release.set()
+    leader.join()
+
+    assert (result, shared) == ('own', False)
+    assert flight.stats.snapshot()['timeouts'] == 1
+
+
+def test_leader_error_reaches_followers():
+    flight = SingleFlight(max_wait=1.0)
+    release = threading.Event()
+    errors = []
+
+    def fetch():
+        release.wait(1)
+        raise ValueError('upstream')
+
+    def call():
+        try:
+            flight.do('key', fetch)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 3
+    assert flight.stats.snapshot()['errors'] == 1
+
+
+def test_async_follower_times_out_and_fetches_itself():
+    async def scenario():
+        flight = AsyncSingleFlight(max_wait=0.05)
+
+        async def slow():
+            await asyncio.sleep(0.5)
+            return 'leader'
+
+        async def fast():
+            return 'own'
+
+        leader = asyncio.ensure_future(flight.do('key', slow))
+        await asyncio.sleep(0)
+        follower = await flight.do('key', fast)
+        leader.cancel()
+        return follower, flight.stats.snapshot()
+
+    (result, shared), stats = asyncio.run(scenario())
+    assert (result, shared) == ('own', False)
+    assert stats['timeouts'] == 1
+
+
+def test_async_cancelled_leader_lets_followers_fall_back():
+    async def scenario():
+        flight = AsyncSingleFlight(max_wait=1.0)
+
+        async def slow():
+            await asyncio.sleep(1)
+            return 'leader'
+
+        async def fast():
+            return 'own'
+
+        leader = asyncio.ensure_future(flight.do('key', slow))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do('key', fast))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == ('own', False)
@@ -3,6 +3,7 @@ from .models import db, Demand
 from .camunda_client import CamundaClient
 from .kafka_client import KafkaClient
 from uuid import uuid4
+from sqlalchemy import text
 
 demands_bp = Blueprint('demands', __name__)
 camunda = CamundaClient()
@@ -148,3 +149,17 @@ def complete_task(task_id):
         return '', 204
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+
+@demands_bp.route('/health/live', methods=['GET'])
+def health_live():
+    return jsonify({"status": "up"}), 200
+
+@demands_bp.route('/health/ready', methods=['GET'])
+def health_ready():
+    try:
+        db.session.execute(text('SELECT 1'))
+        return jsonify({"status": "up"}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"status": "down", "error": str(e)}), 503
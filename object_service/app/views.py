@@ -119,4 +119,18 @@ def get_owned_objects(user_id):
             "has_offer": has_offer
         })
 
-    return jsonify(result), 200
\ No newline at end of file
+    return jsonify(result), 200
+
+
+@galactic_objects_bp.route('/health/live', methods=['GET'])
+def health_live():
+    return jsonify({"status": "up"}), 200
+
+@galactic_objects_bp.route('/health/ready', methods=['GET'])
+def health_ready():
+    try:
+        db.session.query(GalacticObjectType.uuid).first()
+        return jsonify({"status": "up"}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"status": "down", "error": str(e)}), 503
@@ -73,4 +73,19 @@ def login_user():
         "uuid": str(user.uuid),
         "username": user.username,
         "permissions": user.permissions
-    }), 200
\ No newline at end of file
+    }), 200
+
+
+@users_bp.route('/health/live', methods=['GET'])
+def health_live():
+    return jsonify({"status": "up"}), 200
+
+@users_bp.route('/health/ready', methods=['GET'])
+def health_ready():
+    # Login reads the users table, so ready means one row of it can be fetched
+    try:
+        db.session.query(User.uuid).limit(1).all()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"status": "down", "error": str(e)}), 503
+    return jsonify({"status": "up"}), 200